@@ -1,19 +1,31 @@
 """This module is the entry point of the package."""
 
+from .steam_inventory_manager import analytics
+from .steam_inventory_manager import bulk_loader
 from .steam_inventory_manager import constants
 from .steam_inventory_manager import filesystem_handler
+from .steam_inventory_manager import inventory_history
+from .steam_inventory_manager import inventory_index
 from .steam_inventory_manager import item
+from .steam_inventory_manager import memory_usage
 from .steam_inventory_manager import player
 from .steam_inventory_manager import parser
 from .steam_inventory_manager import steam_api_handler
+from .steam_inventory_manager import work_queue
 
 # from . import cli
 
 __all__ = [
+    "analytics",
+    "bulk_loader",
     "constants",
     "filesystem_handler",
+    "inventory_history",
+    "inventory_index",
     "item",
+    "memory_usage",
     "player",
     "parser",
     "steam_api_handler",
+    "work_queue",
 ]
@@ -8,9 +8,148 @@
 # 2. Fetches the inventory for each Steam ID.
 # 3. Displays the fetched inventories if the display option is enabled.
 
+import gc
+import logging
+import sys
+
+from steam_inventory_manager import constants
 from steam_inventory_manager import filesystem_handler
+from steam_inventory_manager import inventory_history
+from steam_inventory_manager import inventory_index
+from steam_inventory_manager import memory_usage
 from steam_inventory_manager import parser
 from steam_inventory_manager import player
+from steam_inventory_manager import steam_api_handler
+from steam_inventory_manager import work_queue
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(constants.APP_NAME)
+
+
+def query_index(args):
+    """
+    Print the players owning the queried item, and their asset IDs.
+    """
+    if args.market_hash_name:
+        field, key = "market_hash_name", args.market_hash_name
+    elif args.hero:
+        field, key = "type_desc_name", args.hero
+    else:
+        field, key = "type_desc", args.type
+
+    for app_id, context_id in args.app_contexts:
+        if args.rebuild:
+            inventory_index.rebuild_index(args.steam_ids, app_id, context_id)
+        postings = inventory_index.query(field, key, app_id, context_id)
+        for steam_id, asset_ids in postings.items():
+            print(
+                f"{steam_id: <20}|{app_id}/{context_id: <6}"
+                f"|{len(asset_ids): <6}|{' '.join(asset_ids)}"
+            )
+
+
+def print_changelog(args):
+    """
+    Print the items added and removed between --since and --until.
+    """
+    since = int(args.since.timestamp()) if args.since else 0
+    until = int(args.until.timestamp()) if args.until else None
+    for steam_id in args.steam_ids:
+        for app_id, context_id in args.app_contexts:
+            changes = inventory_history.changelog(
+                steam_id, since, until, app_id, context_id
+            )
+            for change, sign in (("added", "+"), ("removed", "-")):
+                for asset in changes[change]:
+                    print(
+                        f"{steam_id: <20}|{app_id}/{context_id: <6}|{sign}"
+                        f"|{asset['assetid']: <14}|{asset['market_hash_name']}"
+                    )
+
+
+def print_report(args):
+    """
+    Print the item aggregates of the cached inventories, grouped by --group-by.
+    """
+    # Imported here, numpy is only required by the report
+    from steam_inventory_manager import analytics  # pylint: disable=C0415
+
+    column = {
+        "player": "steam_id",
+        "hero": "type_desc_name",
+        "type": "type_desc",
+        "market_hash_name": "market_hash_name",
+    }[args.group_by]
+    columns = analytics.load_columns(args.steam_ids, args.app_contexts, args.workers)
+    groups = columns.group_by(column)
+    totals = columns.totals()
+
+    print(f"{'KEY': <40}|{'COUNT': <8}|{'MARKET': <7}|{'TRADE': <7}|GIFT")
+    for i in groups["count"].argsort()[::-1]:
+        print(
+            f"{groups['key'][i]: <40}|{groups['count'][i]: <8}"
+            f"|{groups['marketable_ratio'][i]: <7.2f}|{groups['tradable_ratio'][i]: <7.2f}"
+            f"|{groups['giftable_ratio'][i]:.2f}"
+        )
+    print(
+        f"{'TOTAL': <40}|{totals['count']: <8}"
+        f"|{totals['marketable_ratio']: <7.2f}|{totals['tradable_ratio']: <7.2f}"
+        f"|{totals['giftable_ratio']:.2f}"
+    )
+
+
+def process_player(args, steam_id) -> bool:
+    """
+    Fetch and display one player, then release it.
+    In bounded memory mode the peak RSS is reset first, so the peak reported
+    by check_memory is the one of that player.
+    Returns if every inventory of the player was fetched.
+    """
+    if args.bounded_memory:
+        gc.collect()
+        memory_usage.reset_peak_rss()
+    try:
+        current_player = player.Player(
+            args.api_key,
+            steam_id,
+            args.overwrite,
+            args.app_id,
+            app_contexts=args.app_contexts,
+            bounded_memory=args.bounded_memory,
+        )
+    except steam_api_handler.IncompleteInventoryError as error:
+        logger.error("Skipping player %s: %s", steam_id, error)
+        return False
+    if args.display_player:
+        current_player.print()
+    if args.display_inventory:
+        current_player.print_inventory(args)
+    return not current_player.incomplete_app_contexts
+
+
+def check_memory(steam_id, memory_budget) -> bool:
+    """
+    Report the RSS and the peak RSS of the player that was just processed.
+    Flag the player if its peak RSS exceeded the memory budget (MB).
+    Returns if the player stayed within the budget.
+    """
+    gc.collect()
+    peak_rss = memory_usage.get_peak_rss()
+    logger.info(
+        "Player %s processed. RSS: %s, player peak RSS: %s",
+        steam_id,
+        memory_usage.format_mb(memory_usage.get_rss()),
+        memory_usage.format_mb(peak_rss),
+    )
+    if memory_budget and peak_rss and peak_rss > memory_budget * memory_usage.MB:
+        logger.error(
+            "Player %s exceeded the memory budget of %d MB (peak RSS: %s).",
+            steam_id,
+            memory_budget,
+            memory_usage.format_mb(peak_rss),
+        )
+        return False
+    return True
 
 
 def main():
@@ -27,18 +166,42 @@ def main():
     # Get args
     args = parser.get_args()
 
+    if args.command == "query":
+        query_index(args)
+        return
+
+    if args.command == "changelog":
+        print_changelog(args)
+        return
+
+    if args.command == "report":
+        print_report(args)
+        return
+
     print(args.steam_ids, args.steam_users)
 
-    players = [
-        player.Player(args.api_key, steam_id, args.overwrite, args.app_id)
-        for steam_id in args.steam_ids
-    ]
+    # Players are fetched, displayed and released one at a time
+    over_budget = []
+    incomplete = []
+    for steam_id in args.steam_ids:
+        if args.run_id:
+            with work_queue.claim(steam_id, args.run_id) as claim:
+                if claim is None:
+                    continue
+                complete = process_player(args, steam_id)
+                if complete:
+                    work_queue.mark_done(steam_id, args.run_id, claim)
+        else:
+            complete = process_player(args, steam_id)
+        if not complete:
+            incomplete.append(steam_id)
+        if args.bounded_memory and not check_memory(steam_id, args.memory_budget):
+            over_budget.append(steam_id)
 
-    for p in players:
-        if args.display_player:
-            p.print()
-        if args.display_inventory:
-            p.print_inventory(args)
+    if incomplete:
+        logger.error("Players with incomplete inventories: %s", ", ".join(incomplete))
+    if over_budget:
+        logger.error("Players over the memory budget: %s", ", ".join(over_budget))
 
     # players[0].update_inventory_json_descriptions()
 
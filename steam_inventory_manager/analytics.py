@@ -0,0 +1,121 @@
+"""This module computes fleet-wide inventory aggregates over NumPy columns."""
+
+import itertools
+import logging
+import sys
+import numpy as np
+from steam_inventory_manager import bulk_loader
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__package__)
+
+# Columns that can be grouped by, stored as categorical codes
+CATEGORICAL_COLUMNS = ("steam_id", "type_desc", "type_desc_name", "market_hash_name")
+# Columns stored as booleans
+FLAG_COLUMNS = ("marketable", "tradable", "may_be_gifted_once")
+
+
+def encode(values: list):
+    """
+    Encode values as categorical codes.
+    Returns (categories, codes) with categories[codes] == values.
+    """
+    categories, codes = np.unique(
+        np.array(["" if v is None else str(v) for v in values], dtype=object),
+        return_inverse=True,
+    )
+    return categories, codes.astype(np.int32)
+
+
+class InventoryColumns:
+    """
+    This class holds the classified assets of many players as columnar arrays.
+    Counts are weighted by the asset amount.
+    """
+
+    def __init__(self, records: dict):
+        """
+        records: {steam_id: [compact item records]} as returned by
+        bulk_loader.load_inventories.
+        """
+        items = list(itertools.chain.from_iterable(records.values()))
+        fields = dict(
+            zip(
+                bulk_loader.COMPACT_ITEM_FIELDS,
+                zip(*items) if items else [()] * len(bulk_loader.COMPACT_ITEM_FIELDS),
+            )
+        )
+
+        self.size = len(items)
+        self.amount = np.array(fields["amount"], dtype=np.int64)
+        self.categories = {"steam_id": np.array(list(records.keys()), dtype=object)}
+        self.codes = {
+            "steam_id": np.repeat(
+                np.arange(len(records), dtype=np.int32),
+                [len(player_items) for player_items in records.values()],
+            )
+        }
+        for column in CATEGORICAL_COLUMNS[1:]:
+            self.categories[column], self.codes[column] = encode(fields[column])
+        self.flags = {
+            column: np.array(fields[column], dtype=bool) for column in FLAG_COLUMNS
+        }
+
+    def group_by(self, column: str) -> dict:
+        """
+        Aggregate the assets by the given categorical column.
+        Returns a dict of arrays aligned on "key": count, marketable_ratio,
+        tradable_ratio and giftable_ratio.
+        """
+        if column not in CATEGORICAL_COLUMNS:
+            raise SystemExit(f"Invalid group by column: {column}")
+        categories = self.categories[column]
+        codes = self.codes[column]
+        length = len(categories)
+        count = np.bincount(codes, weights=self.amount, minlength=length).astype(
+            np.int64
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios = {
+                f"{name}_ratio": np.bincount(
+                    codes, weights=flag * self.amount, minlength=length
+                )
+                / count
+                for name, flag in (
+                    ("marketable", self.flags["marketable"]),
+                    ("tradable", self.flags["tradable"]),
+                    ("giftable", self.flags["may_be_gifted_once"]),
+                )
+            }
+        return {"key": categories, "count": count, **ratios}
+
+    def totals(self) -> dict:
+        """
+        Returns the fleet-wide aggregates.
+        """
+        count = int(self.amount.sum())
+        return {
+            "count": count,
+            **{
+                f"{name}_ratio": (
+                    (self.flags[flag] * self.amount).sum() / count if count else 0
+                )
+                for name, flag in (
+                    ("marketable", "marketable"),
+                    ("tradable", "tradable"),
+                    ("giftable", "may_be_gifted_once"),
+                )
+            },
+        }
+
+
+def load_columns(
+    steam_ids: list, app_contexts: list = None, max_workers: int = None
+) -> InventoryColumns:
+    """
+    Load the cached inventories of the given players and (app_id, context_id)
+    pairs into columns.
+    """
+    return InventoryColumns(
+        bulk_loader.load_inventories(steam_ids, app_contexts, max_workers)
+    )
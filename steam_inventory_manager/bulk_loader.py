@@ -0,0 +1,88 @@
+"""This module loads many cached inventories in parallel using a process pool."""
+
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from steam_inventory_manager import constants
+from steam_inventory_manager import filesystem_handler
+from steam_inventory_manager import item
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__package__)
+
+# Fields of the compact record returned by the workers, one record per asset.
+# Workers return plain tuples instead of Item objects to keep IPC cheap.
+COMPACT_ITEM_FIELDS = ("assetid", "amount") + item.Item.CLASSIFIED_FIELDS
+
+
+def compact_item(asset: dict, inventory_item: item.Item) -> tuple:
+    """
+    Returns the compact record of an asset and its Item, ordered as
+    COMPACT_ITEM_FIELDS.
+    """
+    return (asset.get("assetid"), int(asset.get("amount") or 1)) + tuple(
+        getattr(inventory_item, field) for field in COMPACT_ITEM_FIELDS[2:]
+    )
+
+
+def classify_inventory_file(json_file_path: str) -> list:
+    """
+    Read a cached inventory file, classify its descriptions and join them to
+    the assets on (classid, instanceid).
+    Runs inside a worker process.
+    Returns a list of compact records, one per asset.
+    """
+    inventory_json = filesystem_handler.read_json(json_file_path)
+    items = {
+        (d.get("classid"), d.get("instanceid")): item.Item(d)
+        for d in inventory_json.get("descriptions") or []
+    }
+    records = []
+    for asset in inventory_json.get("assets") or []:
+        asset_item = items.get((asset.get("classid"), asset.get("instanceid")))
+        if asset_item is not None:
+            records.append(compact_item(asset, asset_item))
+    return records
+
+
+def load_inventories(
+    steam_ids: list,
+    app_contexts: list = None,
+    max_workers: int = None,
+    chunksize: int = 8,
+) -> dict:
+    """
+    Load the cached inventories of many players using a process pool.
+    app_contexts: (app_id, context_id) pairs merged per player, defaults to
+    [(constants.APP_ID, constants.CONTEXT_ID)].
+    Inventories that are not cached are skipped.
+    Returns a dict {steam_id: [compact item records]}.
+    """
+    app_contexts = app_contexts or [(constants.APP_ID, constants.CONTEXT_ID)]
+    paths = []
+    for steam_id in steam_ids:
+        for app_id, context_id in app_contexts:
+            inventory_json_path = filesystem_handler.get_inventory_json_path(
+                steam_id, app_id, context_id
+            )
+            if not os.path.exists(inventory_json_path):
+                logger.warning(
+                    "No cached inventory %s/%s for '%s', skipping.",
+                    app_id,
+                    context_id,
+                    steam_id,
+                )
+                continue
+            paths.append((steam_id, inventory_json_path))
+
+    records = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            classify_inventory_file,
+            [inventory_json_path for _, inventory_json_path in paths],
+            chunksize=chunksize,
+        )
+        for (steam_id, _), player_records in zip(paths, results):
+            records.setdefault(steam_id, []).extend(player_records)
+    return records
@@ -8,11 +8,17 @@ from platformdirs import PlatformDirs
 APP_NAME = "steam_inventory_manager"
 STEAM_API_KEY_USAGE_LIMIT = 10
 APP_ID = 570
-APP_ID_map = {570, "Dota 2"}
+APP_ID_map = {570: "Dota 2", 730: "Counter-Strike 2", 440: "Team Fortress 2"}
 CACHE_DIR = PlatformDirs(APP_NAME, getpass.getuser()).user_data_dir
 CONTEXT_ID = "2"  # Default context ID for most games
 INVENTORY_URL_TIMEOUT = 1000000000  # 1 second
+INVENTORY_PAGE_RETRIES = 3  # Attempts per inventory page before giving up
+INVENTORY_RETRY_DELAY = 5  # Seconds, doubled after each failed attempt
+INVENTORY_CHECKPOINT_MAX_AGE = 3600  # Seconds, older pagination checkpoints are discarded
 STEAM_API_KEY_env = "STEAM_API_KEY"
+CACHE_LEASE_SECONDS = 600  # A cache lock older than this is considered stale
+CACHE_LOCK_POLL_SECONDS = 0.1
+INDEX_SHARDS = 256  # The inventory index is split by item key in this many files
 
 
 class ItemType(Enum):
@@ -2,14 +2,31 @@
 
 import json
 import logging
+import mmap
 import os
+import re
+import socket
 import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager, suppress
 
 from steam_inventory_manager import constants
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 logger = logging.getLogger(__package__)
 
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# Strings (with escapes) and brackets are the only tokens needed to track nesting
+_JSON_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|[\[\]{}]')
+
 
 def create_cache_dir():
     """Create the cache directory if it does not exist."""
@@ -17,16 +34,333 @@ def create_cache_dir():
         os.makedirs(constants.CACHE_DIR)
 
 
+def get_player_summaries_path(steam_id: str) -> str:
+    """Returns the file path for the player summaries file."""
+    return f"{constants.CACHE_DIR}/{steam_id}_summaries.json"
+
+
+def get_inventory_json_path(
+    steam_id: str, app_id: str, context_id: str = constants.CONTEXT_ID
+) -> str:
+    """
+    Returns the file path for the inventory file.
+    Non default contexts get their own file.
+    """
+    if context_id != constants.CONTEXT_ID:
+        return f"{constants.CACHE_DIR}/{steam_id}_full_inventory_{app_id}_{context_id}.json"
+    return f"{constants.CACHE_DIR}/{steam_id}_full_inventory_{app_id}.json"
+
+
 def read_json(json_file_path: str) -> dict:
-    """Read the inventory from the given file path."""
-    with open(json_file_path, "r", encoding="utf-8") as file:
+    """Read the inventory from the given file path, with orjson when installed."""
+    with open(json_file_path, "rb") as file:
         logger.info("Reading '%s'.", json_file_path)
-        inventory_json = json.load(file)
+        inventory_json = _loads(file.read())
         return inventory_json
 
 
-def write_json(json_file_path: str, inventory_json: dict):
-    """Write the inventory to the given file path."""
-    with open(json_file_path, "w", encoding="utf-8") as file:
-        json.dump(inventory_json, file, indent=4)
+class LockLostError(Exception):
+    """
+    Raised when a cache lock was broken as stale while still held.
+    Its holder must not write the cache entry.
+    """
+
+
+class CacheLease:
+    """
+    The lease yielded by cache_lock.
+    Pass it to write_json or append_json_line to write only while it is held.
+    """
+
+    def __init__(self, lock_path: str, owner: str):
+        self.lock_path = lock_path
+        self.owner = owner
+        self.lost = threading.Event()
+
+    def check(self):
+        """Raise LockLostError if the lock is no longer ours."""
+        if self.lost.is_set() or _read_owner(self.lock_path) != self.owner:
+            self.lost.set()
+            raise LockLostError(f"Lost lock '{self.lock_path}'.")
+
+
+def write_json(
+    json_file_path: str,
+    inventory_json: dict,
+    indent: int = 4,
+    lease: CacheLease = None,
+):
+    """
+    Write the inventory to the given file path.
+    The file is written aside and renamed, readers never see a partial file.
+    indent=None writes compact JSON. With a lease, the file is only renamed
+    in place if the lease is still held.
+    """
+    tmp_file_path = f"{json_file_path}.{socket.gethostname()}.{os.getpid()}.tmp"
+    with open(tmp_file_path, "w", encoding="utf-8") as file:
+        json.dump(inventory_json, file, indent=indent)
+        file.flush()
+        os.fsync(file.fileno())
+    try:
+        if lease is not None:
+            lease.check()
+    except LockLostError:
+        os.remove(tmp_file_path)
+        raise
+    os.replace(tmp_file_path, json_file_path)
     logger.info("Inventory saved in: '%s'.", json_file_path)
+
+
+def get_mtime(file_path: str) -> float:
+    """Return the modification time of the given file, None if it does not exist."""
+    try:
+        return os.path.getmtime(file_path)
+    except FileNotFoundError:
+        return None
+
+
+def _is_lease_expired(lock_path: str, lease_seconds: float) -> bool:
+    """Return if the lock file is older than its lease."""
+    try:
+        return time.time() - os.path.getmtime(lock_path) > lease_seconds
+    except FileNotFoundError:
+        return False
+
+
+def _read_owner(lock_path: str) -> str:
+    """Return the owner written in the lock file, None if it does not exist."""
+    try:
+        with open(lock_path, "r", encoding="utf-8") as lock_file:
+            return lock_file.read()
+    except FileNotFoundError:
+        return None
+
+
+def _get_lock_id(lock_path: str) -> tuple:
+    """Return the (inode, owner) of the lock file, None if it does not exist."""
+    try:
+        inode = os.stat(lock_path).st_ino
+    except FileNotFoundError:
+        return None
+    return (inode, _read_owner(lock_path))
+
+
+def _create_lock(lock_path: str) -> int:
+    """Create the lock file with O_EXCL, return its fd or None if it exists."""
+    try:
+        return os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return None
+
+
+def _break_stale_lock(lock_path: str, stale_id: tuple, lease_seconds: float) -> bool:
+    """
+    Break a stale lock, seen as stale_id by the caller.
+    Breakers take turns through a "<lock_path>.break" lock, and the lock is
+    only removed if it is still the same file (inode and owner) and still
+    expired, so a lock taken again in between is left alone.
+    Returns if the lock was broken.
+    """
+    break_path = f"{lock_path}.break"
+    try:
+        os.close(os.open(break_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        # Another worker is breaking the lock, or died doing so
+        if _is_lease_expired(break_path, lease_seconds):
+            with suppress(FileNotFoundError):
+                os.remove(break_path)
+        return False
+    try:
+        if _get_lock_id(lock_path) != stale_id or not _is_lease_expired(
+            lock_path, lease_seconds
+        ):
+            return False
+        os.remove(lock_path)
+        logger.warning("Broke stale lock '%s' of '%s'.", lock_path, stale_id[1])
+        return True
+    finally:
+        os.remove(break_path)
+
+
+def _renew_lease(lease: CacheLease, stop: threading.Event, interval: float):
+    """Touch the lock file every interval until stop is set, while we own it."""
+    while not stop.wait(interval):
+        if _read_owner(lease.lock_path) != lease.owner:
+            logger.error("Lost lock '%s', its holder stops.", lease.lock_path)
+            lease.lost.set()
+            return
+        try:
+            os.utime(lease.lock_path)
+        except FileNotFoundError:
+            lease.lost.set()
+            return
+
+
+@contextmanager
+def cache_lock(
+    file_path: str,
+    lease_seconds: float = constants.CACHE_LEASE_SECONDS,
+    blocking: bool = True,
+):
+    """
+    Hold an exclusive lease on a cache entry, shared by every process and host
+    using the same CACHE_DIR. The lease is a "<file_path>.lock" file created
+    with O_EXCL and renewed in the background while held; a lease older than
+    lease_seconds is considered stale and broken.
+    Yields the CacheLease once acquired; with blocking=False yields None if it
+    is held. Raises LockLostError on release if the lease was lost meanwhile.
+    """
+    lock_path = f"{file_path}.lock"
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+    lock_fd = _create_lock(lock_path)
+    while lock_fd is None:
+        stale_id = _get_lock_id(lock_path)
+        if not (
+            stale_id is not None
+            and _is_lease_expired(lock_path, lease_seconds)
+            and _break_stale_lock(lock_path, stale_id, lease_seconds)
+        ):
+            if not blocking:
+                yield None
+                return
+            time.sleep(constants.CACHE_LOCK_POLL_SECONDS)
+        lock_fd = _create_lock(lock_path)
+    with os.fdopen(lock_fd, "w", encoding="utf-8") as lock_file:
+        lock_file.write(owner)
+
+    lease = CacheLease(lock_path, owner)
+    stop = threading.Event()
+    renewer = threading.Thread(
+        target=_renew_lease, args=(lease, stop, lease_seconds / 4), daemon=True
+    )
+    renewer.start()
+    try:
+        yield lease
+    finally:
+        stop.set()
+        renewer.join()
+        held = _read_owner(lock_path) == owner
+        if held:
+            os.remove(lock_path)
+    if not held:
+        raise LockLostError(f"Lost lock '{lock_path}'.")
+
+
+def _next_char(buffer, position: int):
+    """Return the first non-whitespace byte from `position`, and its position."""
+    while position < len(buffer) and buffer[position : position + 1].isspace():
+        position += 1
+    return buffer[position : position + 1], position
+
+
+def _is_array_key(buffer, end: int) -> bool:
+    """Return if the string token ending at `end` is a key whose value is an array."""
+    char, position = _next_char(buffer, end)
+    if char != b":":
+        return False
+    return _next_char(buffer, position + 1)[0] == b"["
+
+
+def iter_json_records(json_file_path: str, key: str):
+    """
+    Memory-map the given file and yield, one at a time, the objects of the
+    top-level array `key` (e.g. "assets" or "descriptions").
+    Only one record is decoded at a time, orjson is used when installed.
+    The tokenizer is slower than read_json, use it only where memory matters.
+    """
+    if os.path.getsize(json_file_path) == 0:
+        return
+    key_token = f'"{key}"'.encode("utf-8")
+    with open(json_file_path, "rb") as file, mmap.mmap(
+        file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as buffer:
+        logger.info("Streaming '%s' from '%s'.", key, json_file_path)
+        depth = 0
+        key_found = False
+        in_array = False
+        record_start = None
+        for token in _JSON_TOKEN.finditer(buffer):
+            char = token.group()[:1]
+            if char == b'"':
+                if (
+                    depth == 1
+                    and not in_array
+                    and token.group() == key_token
+                    and _is_array_key(buffer, token.end())
+                ):
+                    key_found = True
+                continue
+            if char in b"[{":
+                depth += 1
+                if key_found and depth == 2:
+                    key_found = False
+                    in_array = True
+                elif in_array and depth == 3:
+                    record_start = token.start()
+                continue
+            if in_array and depth == 3 and record_start is not None:
+                yield _loads(buffer[record_start : token.end()])
+                record_start = None
+            elif in_array and depth == 2:
+                return
+            depth -= 1
+
+
+def _truncate_partial_line(file) -> int:
+    """
+    Truncate the last line of a JSON lines file opened in "a+b" mode if an
+    interrupted append left it without its newline.
+    Returns the size of the file.
+    """
+    size = file.seek(0, os.SEEK_END)
+    end = size
+    while end > 0:
+        start = max(0, end - 4096)
+        file.seek(start)
+        newline = file.read(end - start).rfind(b"\n")
+        if newline != -1:
+            end = start + newline + 1
+            break
+        end = start
+    if end != size:
+        logger.warning("Truncating a partial line at the end of '%s'.", file.name)
+        file.truncate(end)
+    return end
+
+
+def append_json_line(
+    json_lines_path: str, record: dict, lease: CacheLease = None
+) -> int:
+    """
+    Append one record to the given JSON lines file, in a single write.
+    A partial last line left by an interrupted append is truncated first.
+    With a lease, the record is only appended if the lease is still held.
+    Returns the byte offset of the record.
+    """
+    if lease is not None:
+        lease.check()
+    with open(json_lines_path, "a+b") as file:
+        offset = _truncate_partial_line(file)
+        file.write(json.dumps(record).encode("utf-8") + b"\n")
+        file.flush()
+        os.fsync(file.fileno())
+    return offset
+
+
+def iter_json_lines(json_lines_path: str, offset: int = 0):
+    """
+    Yield the raw lines of the given JSON lines file from the byte offset,
+    without decoding them. A partial last line is skipped.
+    """
+    if not os.path.exists(json_lines_path):
+        return
+    with open(json_lines_path, "rb") as file:
+        file.seek(offset)
+        for line in file:
+            if not line.endswith(b"\n"):
+                logger.warning(
+                    "Skipping a partial line at the end of '%s'.", json_lines_path
+                )
+                return
+            if line.strip():
+                yield line.decode("utf-8")
@@ -0,0 +1,197 @@
+"""This module stores the inventory history as deltas with periodic checkpoints."""
+
+import json
+import logging
+import re
+import sys
+import time
+from steam_inventory_manager import constants
+from steam_inventory_manager import filesystem_handler
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__package__)
+
+# A full checkpoint is written every CHECKPOINT_INTERVAL snapshots
+CHECKPOINT_INTERVAL = 10
+# Checkpoint records start with this prefix, so they are found without decoding
+CHECKPOINT_PREFIX = '{"checkpoint": true'
+# Every record starts with its checkpoint flag and time, read without decoding
+RECORD_TIME = re.compile(r'\{"checkpoint": (?:true|false), "time": (\d+)')
+
+
+def get_history_path(
+    steam_id: str, app_id: str, context_id: str = constants.CONTEXT_ID
+) -> str:
+    """
+    Returns the file path for the history file (JSON lines).
+    """
+    if context_id != constants.CONTEXT_ID:
+        return f"{constants.CACHE_DIR}/{steam_id}_history_{app_id}_{context_id}.jsonl"
+    return f"{constants.CACHE_DIR}/{steam_id}_history_{app_id}.jsonl"
+
+
+def get_checkpoints_path(history_path: str) -> str:
+    """
+    Returns the file path for the sidecar listing the byte offset and time of
+    every checkpoint of the history file.
+    """
+    return f"{history_path}.checkpoints"
+
+
+def load_checkpoints(history_path: str) -> list:
+    """
+    Returns the checkpoints [{"offset": ..., "time": ...}] of the history file.
+    """
+    return [
+        json.loads(line)
+        for line in filesystem_handler.iter_json_lines(
+            get_checkpoints_path(history_path)
+        )
+    ]
+
+
+def get_record_time(line: str) -> int:
+    """
+    Returns the time of a history record, read from its prefix when possible.
+    """
+    match = RECORD_TIME.match(line)
+    if match:
+        return int(match.group(1))
+    return json.loads(line)["time"]
+
+
+def description_key(record: dict) -> str:
+    """
+    Returns the key linking an asset to its description.
+    """
+    return f"{record.get('classid')}_{record.get('instanceid')}"
+
+
+def load_state(history_path: str):
+    """
+    Rebuild the latest state from the last checkpoint and the deltas after it,
+    reading the history from the offset of the last checkpoint.
+    Returns (assets {assetid: asset}, description keys, deltas since checkpoint).
+    """
+    checkpoints = load_checkpoints(history_path)
+    offset = checkpoints[-1]["offset"] if checkpoints else 0
+    lines = []
+    for line in filesystem_handler.iter_json_lines(history_path, offset):
+        if line.startswith(CHECKPOINT_PREFIX):
+            lines = []
+        lines.append(line)
+
+    assets = {}
+    descriptions = set()
+    for line in lines:
+        record = json.loads(line)
+        if record.get("checkpoint"):
+            assets = {asset["assetid"]: asset for asset in record["assets"]}
+        else:
+            for asset in record["removed"]:
+                assets.pop(asset["assetid"], None)
+            for asset in record["added"]:
+                assets[asset["assetid"]] = asset
+        descriptions.update(description_key(d) for d in record["descriptions"])
+    return assets, descriptions, (len(lines) - 1 if lines else None)
+
+
+def record_snapshot(
+    steam_id: str,
+    inventory_json: dict,
+    app_id: str = constants.APP_ID,
+    context_id: str = constants.CONTEXT_ID,
+):
+    """
+    Append the difference between the given inventory and the last snapshot.
+    Every CHECKPOINT_INTERVAL snapshots the full inventory is stored instead.
+    """
+    history_path = get_history_path(steam_id, app_id, context_id)
+    with filesystem_handler.cache_lock(history_path) as lease:
+        old_assets, old_descriptions, deltas = load_state(history_path)
+
+        new_assets = {
+            asset["assetid"]: asset for asset in inventory_json.get("assets") or []
+        }
+        added_ids = new_assets.keys() - old_assets.keys()
+        removed_ids = old_assets.keys() - new_assets.keys()
+        checkpoint = deltas is None or deltas + 1 >= CHECKPOINT_INTERVAL
+
+        record = {
+            "checkpoint": checkpoint,
+            "time": int(time.time()),
+            "added": [new_assets[asset_id] for asset_id in sorted(added_ids)],
+            "removed": [old_assets[asset_id] for asset_id in sorted(removed_ids)],
+        }
+        descriptions = inventory_json.get("descriptions") or []
+        if checkpoint:
+            record["assets"] = list(new_assets.values())
+            record["descriptions"] = descriptions
+        else:
+            record["descriptions"] = [
+                d for d in descriptions if description_key(d) not in old_descriptions
+            ]
+
+        offset = filesystem_handler.append_json_line(history_path, record, lease)
+        if checkpoint:
+            filesystem_handler.append_json_line(
+                get_checkpoints_path(history_path),
+                {"offset": offset, "time": record["time"]},
+            )
+        logger.info(
+            "Snapshot saved in: '%s' (+%d -%d).",
+            history_path,
+            len(added_ids),
+            len(removed_ids),
+        )
+
+
+def changelog(
+    steam_id: str,
+    since: int = 0,
+    until: int = None,
+    app_id: str = constants.APP_ID,
+    context_id: str = constants.CONTEXT_ID,
+) -> dict:
+    """
+    Returns the net item changes {"added": [...], "removed": [...]} between the
+    timestamps since (exclusive) and until (inclusive), composing only deltas.
+    Reading starts at the last checkpoint before since, whose descriptions and
+    the ones of the following records describe every asset changed afterwards.
+    """
+    history_path = get_history_path(steam_id, app_id, context_id)
+    offset = 0
+    for checkpoint in load_checkpoints(history_path):
+        if checkpoint["time"] > since:
+            break
+        offset = checkpoint["offset"]
+
+    added = {}
+    removed = {}
+    descriptions = {}
+    for line in filesystem_handler.iter_json_lines(history_path, offset):
+        if until is not None and get_record_time(line) > until:
+            break
+        record = json.loads(line)
+        descriptions.update((description_key(d), d) for d in record["descriptions"])
+        if record["time"] <= since:
+            continue
+        for asset in record["removed"]:
+            if added.pop(asset["assetid"], None) is None:
+                removed[asset["assetid"]] = asset
+        for asset in record["added"]:
+            if removed.pop(asset["assetid"], None) is None:
+                added[asset["assetid"]] = asset
+
+    def describe(asset):
+        description = descriptions.get(description_key(asset), {})
+        return {
+            "assetid": asset["assetid"],
+            "market_hash_name": description.get("market_hash_name"),
+            "type": description.get("type"),
+        }
+
+    return {
+        "added": [describe(asset) for asset in added.values()],
+        "removed": [describe(asset) for asset in removed.values()],
+    }
@@ -0,0 +1,258 @@
+"""This module maintains a persisted inverted index: item key -> players owning it."""
+
+import logging
+import os
+import sys
+import zlib
+from steam_inventory_manager import constants
+from steam_inventory_manager import filesystem_handler
+from steam_inventory_manager import item
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__package__)
+
+# Item attributes that can be queried
+INDEX_FIELDS = ("market_hash_name", "type_desc_name", "type_desc")
+
+
+def get_shard(field: str, key: str) -> int:
+    """
+    Returns the index shard holding the postings of the given field and key.
+    """
+    return zlib.crc32(f"{field}\0{key}".encode("utf-8")) % constants.INDEX_SHARDS
+
+
+def get_index_dir(
+    app_id: str = constants.APP_ID, context_id: str = constants.CONTEXT_ID
+) -> str:
+    """
+    Returns the directory holding the inverted index of the given app.
+    Non default contexts get their own index.
+    """
+    if context_id != constants.CONTEXT_ID:
+        return f"{constants.CACHE_DIR}/inventory_index_{app_id}_{context_id}"
+    return f"{constants.CACHE_DIR}/inventory_index_{app_id}"
+
+
+def get_index_path(
+    app_id: str = constants.APP_ID,
+    context_id: str = constants.CONTEXT_ID,
+    shard: int = 0,
+) -> str:
+    """
+    Returns the file path for one shard of the inverted index.
+    """
+    return f"{get_index_dir(app_id, context_id)}/{shard:03d}.json"
+
+
+def get_player_postings_path(
+    steam_id: str,
+    app_id: str = constants.APP_ID,
+    context_id: str = constants.CONTEXT_ID,
+) -> str:
+    """
+    Returns the file path for the postings of one player, kept to find the
+    shards to rewrite when its inventory is refreshed.
+    """
+    return f"{get_index_dir(app_id, context_id)}/players/{steam_id}.json"
+
+
+def create_index_dir(
+    app_id: str = constants.APP_ID, context_id: str = constants.CONTEXT_ID
+):
+    """Create the index directory of the given app if it does not exist."""
+    os.makedirs(f"{get_index_dir(app_id, context_id)}/players", exist_ok=True)
+
+
+def new_index() -> dict:
+    """
+    Returns an empty index shard {field: {key: {steam_id: [assetids]}}}.
+    """
+    return {field: {} for field in INDEX_FIELDS}
+
+
+def load_index(
+    app_id: str = constants.APP_ID,
+    context_id: str = constants.CONTEXT_ID,
+    shard: int = 0,
+) -> dict:
+    """
+    Load one shard of the index from disk, or an empty one if it does not exist.
+    """
+    index_path = get_index_path(app_id, context_id, shard)
+    if os.path.exists(index_path):
+        return filesystem_handler.read_json(index_path)
+    return new_index()
+
+
+def save_index(
+    index: dict,
+    app_id: str = constants.APP_ID,
+    context_id: str = constants.CONTEXT_ID,
+    shard: int = 0,
+    lease: filesystem_handler.CacheLease = None,
+):
+    """
+    Write one shard of the index to disk, as compact JSON.
+    """
+    filesystem_handler.write_json(
+        get_index_path(app_id, context_id, shard), index, indent=None, lease=lease
+    )
+
+
+def get_player_postings(assets: list, descriptions: list) -> dict:
+    """
+    Returns the postings {field: {key: [assetids]}} of one player.
+    """
+    items = {
+        (d.get("classid"), d.get("instanceid")): item.Item(d) for d in descriptions
+    }
+    postings = new_index()
+    for asset in assets:
+        asset_item = items.get((asset.get("classid"), asset.get("instanceid")))
+        if asset_item is None:
+            continue
+        for field in INDEX_FIELDS:
+            key = getattr(asset_item, field)
+            if key is not None:
+                postings[field].setdefault(key, []).append(asset.get("assetid"))
+    return postings
+
+
+def remove_players(index: dict, steam_ids: set) -> bool:
+    """
+    Remove every posting of the given players from an index shard.
+    Returns if a posting was removed.
+    """
+    removed = False
+    for field in INDEX_FIELDS:
+        for key, key_postings in list(index[field].items()):
+            for steam_id in steam_ids & key_postings.keys():
+                del key_postings[steam_id]
+                removed = True
+            if not key_postings:
+                del index[field][key]
+    return removed
+
+
+def update_shard(
+    shard: int,
+    updates: dict,
+    app_id: str = constants.APP_ID,
+    context_id: str = constants.CONTEXT_ID,
+    removed_steam_ids: set = frozenset(),
+):
+    """
+    Apply updates {(field, key): {steam_id: [assetids] or None}} to one shard,
+    under its lock; None removes the posting. The postings of removed_steam_ids
+    are dropped from every key of the shard first.
+    """
+    with filesystem_handler.cache_lock(
+        get_index_path(app_id, context_id, shard)
+    ) as lease:
+        index = load_index(app_id, context_id, shard)
+        if not remove_players(index, removed_steam_ids) and not updates:
+            return
+        for (field, key), players in updates.items():
+            key_postings = index[field].setdefault(key, {})
+            for steam_id, asset_ids in players.items():
+                if asset_ids:
+                    key_postings[steam_id] = asset_ids
+                else:
+                    key_postings.pop(steam_id, None)
+            if not key_postings:
+                del index[field][key]
+        save_index(index, app_id, context_id, shard, lease)
+
+
+def update_player(
+    steam_id: str,
+    inventory_json: dict,
+    app_id: str = constants.APP_ID,
+    context_id: str = constants.CONTEXT_ID,
+):
+    """
+    Replace the postings of the given player with its refreshed inventory.
+    Only the shards of the keys whose postings changed are rewritten, under
+    the lock of the player postings.
+    """
+    create_index_dir(app_id, context_id)
+    player_postings_path = get_player_postings_path(steam_id, app_id, context_id)
+    with filesystem_handler.cache_lock(player_postings_path) as lease:
+        old_postings = (
+            filesystem_handler.read_json(player_postings_path)
+            if os.path.exists(player_postings_path)
+            else new_index()
+        )
+        new_postings = get_player_postings(
+            inventory_json.get("assets") or [],
+            inventory_json.get("descriptions") or [],
+        )
+        updates = {}
+        for field in INDEX_FIELDS:
+            for key in old_postings[field].keys() | new_postings[field].keys():
+                asset_ids = new_postings[field].get(key)
+                if asset_ids != old_postings[field].get(key):
+                    updates.setdefault(get_shard(field, key), {})[(field, key)] = {
+                        steam_id: asset_ids
+                    }
+        for shard, shard_updates in updates.items():
+            update_shard(shard, shard_updates, app_id, context_id)
+        filesystem_handler.write_json(
+            player_postings_path, new_postings, indent=None, lease=lease
+        )
+
+
+def rebuild_index(
+    steam_ids: list,
+    app_id: str = constants.APP_ID,
+    context_id: str = constants.CONTEXT_ID,
+):
+    """
+    Replace the postings of the given players from their cached inventories.
+    The postings of other players are kept.
+    """
+    create_index_dir(app_id, context_id)
+    players = {}
+    updates = {}
+    for steam_id in steam_ids:
+        inventory_json_path = filesystem_handler.get_inventory_json_path(
+            steam_id, app_id, context_id
+        )
+        if not os.path.exists(inventory_json_path):
+            logger.warning("No cached inventory for '%s', skipping.", steam_id)
+            continue
+        inventory_json = filesystem_handler.read_json(inventory_json_path)
+        players[steam_id] = get_player_postings(
+            inventory_json.get("assets") or [],
+            inventory_json.get("descriptions") or [],
+        )
+        for field in INDEX_FIELDS:
+            for key, asset_ids in players[steam_id][field].items():
+                shard_updates = updates.setdefault(get_shard(field, key), {})
+                shard_updates.setdefault((field, key), {})[steam_id] = asset_ids
+
+    for shard in range(constants.INDEX_SHARDS):
+        update_shard(shard, updates.get(shard, {}), app_id, context_id, players.keys())
+    for steam_id, postings in players.items():
+        player_postings_path = get_player_postings_path(steam_id, app_id, context_id)
+        with filesystem_handler.cache_lock(player_postings_path) as lease:
+            filesystem_handler.write_json(
+                player_postings_path, postings, indent=None, lease=lease
+            )
+
+
+def query(
+    field: str,
+    key: str,
+    app_id: str = constants.APP_ID,
+    context_id: str = constants.CONTEXT_ID,
+) -> dict:
+    """
+    Returns the postings {steam_id: [assetids]} for the given field and key,
+    read from the only shard that can hold them.
+    """
+    if field not in INDEX_FIELDS:
+        raise SystemExit(f"Invalid index field: {field}")
+    shard = get_shard(field, key)
+    return load_index(app_id, context_id, shard)[field].get(key, {})
@@ -13,6 +13,27 @@ class Item:
     from the item description.
     """
 
+    # Attributes identifying and classifying the item, also used by bulk_loader
+    CLASSIFIED_FIELDS = (
+        "classid",
+        "instanceid",
+        "market_hash_name",
+        "type_desc",
+        "type_desc_name",
+        "marketable",
+        "tradable",
+        "may_be_gifted_once",
+    )
+    # Attributes kept by slim(), the ones needed to print and filter the item
+    OUTPUT_FIELDS = CLASSIFIED_FIELDS + (
+        "market_name",
+        "type",
+        "name",
+        "lowest_price",
+        "median_price",
+        "volume",
+    )
+
     def __init__(self, item_description: dict):
         if not item_description:
             raise SystemExit("Inventory: Invalid item_description")
@@ -67,6 +88,15 @@ class Item:
             return
         print(line)
 
+    def slim(self):
+        """
+        Drop every attribute not needed to print and filter the item.
+        """
+        for attribute in list(vars(self)):
+            if attribute not in self.OUTPUT_FIELDS:
+                delattr(self, attribute)
+        return self
+
     def set_is_gifted_once(self) -> bool:
         """
         Return if the item may be gifted once
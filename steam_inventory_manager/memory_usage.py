@@ -0,0 +1,66 @@
+"""This module reports the memory used by the process."""
+
+import logging
+import os
+import sys
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__package__)
+
+MB = 1024 * 1024
+
+
+def get_rss() -> int:
+    """
+    Returns the current resident set size in bytes, None if unknown.
+    """
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def reset_peak_rss() -> bool:
+    """
+    Reset the peak resident set size (Linux VmHWM) to the current RSS, so the
+    next get_peak_rss covers only what happened since.
+    Returns False if not supported, the peak then covers the process lifetime.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="utf-8") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def get_peak_rss() -> int:
+    """
+    Returns the peak resident set size in bytes since the last reset_peak_rss,
+    or over the process lifetime where it cannot be reset. None if unknown.
+    """
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def format_mb(size: int) -> str:
+    """
+    Returns the size in MB, "N/A" if unknown.
+    """
+    return "N/A" if size is None else f"{size / MB:.1f} MB"
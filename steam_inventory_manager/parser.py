@@ -4,6 +4,7 @@ import argparse
 import logging
 import os
 import sys
+from datetime import datetime
 from steam_inventory_manager import constants
 from steam_inventory_manager import steam_api_handler
 
@@ -37,11 +38,51 @@ class CustomAction(argparse.Action):
             setattr(namespace, self.dest, get_env_api_key(values))
 
 
+def steam_id(value: str) -> str:
+    """
+    Validate a SteamID argument, so a subcommand name following --steam-ids
+    is rejected instead of being read as a steam ID.
+    """
+    if not value.isdigit():
+        raise argparse.ArgumentTypeError(
+            f"Invalid steam ID: {value} (pass --steam-ids after the subcommand)"
+        )
+    return value
+
+
+def app_context(value: str) -> tuple:
+    """
+    Parse an "app_id[:context_id]" argument into an (app_id, context_id) pair.
+    Both must be numeric, so a subcommand name following --app-contexts is
+    rejected instead of being read as an app.
+    """
+    app_id, _, context_id = value.partition(":")
+    context_id = context_id or constants.CONTEXT_ID
+    if not app_id.isdigit() or not context_id.isdigit():
+        raise argparse.ArgumentTypeError(
+            f"Invalid app context: {value} (pass --app-contexts after the subcommand)"
+        )
+    return (app_id, context_id)
+
+
 def check_args(args):
     """
     Check the command line arguments for validity.
     """
 
+    if args.app_contexts is None:
+        args.app_contexts = [(args.app_id, constants.CONTEXT_ID)]
+
+    if args.command == "query":
+        if args.rebuild and args.steam_ids is None:
+            raise SystemExit("Please provide --steam-ids to rebuild the index.")
+        return
+
+    if args.command in ("changelog", "report"):
+        if args.steam_ids is None:
+            raise SystemExit(f"Please provide --steam-ids for the {args.command}.")
+        return
+
     args.api_key = get_env_api_key(args.api_key)
 
     if args.steam_ids is None:
@@ -56,6 +97,9 @@ def check_args(args):
     if args.steam_ids is None and args.steam_users is None:
         raise SystemExit("Please provide either --profile-id or --profile-user.")
 
+    if args.memory_budget is not None:
+        args.bounded_memory = True
+
     # Always display player summaries if inventory is requested
     if args.display_inventory:
         args.display_player = True
@@ -70,11 +114,19 @@ def get_args():
     parser = argparse.ArgumentParser(
         prog="steam_inventory_manager", description="Fetch Steam Manager."
     )
-    parser.add_argument("--steam-ids", nargs="+", type=str, help="17-digit SteamIDs.")
+    parser.add_argument(
+        "--steam-ids", nargs="+", type=steam_id, help="17-digit SteamIDs."
+    )
     parser.add_argument("--steam-users", nargs="+", type=str, help="List of users.")
     parser.add_argument(
         "--app-id", type=str, default="570", help="The app ID (Dota 2=570)."
     )
+    parser.add_argument(
+        "--app-contexts",
+        nargs="+",
+        type=app_context,
+        help="app_id[:context_id] pairs fetched concurrently, e.g. 570 730:2 440:2.",
+    )
     parser.add_argument(
         "--api-key",
         default=constants.STEAM_API_KEY_env,
@@ -84,6 +136,22 @@ def get_args():
     parser.add_argument(
         "--overwrite", action="store_true", help="Overwrite the inventory files."
     )
+    parser.add_argument(
+        "--bounded-memory",
+        action="store_true",
+        help="Stream items from the cache one player at a time, report RSS per player.",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=int,
+        help="After each player, flag it if its peak RSS exceeded this budget (MB). "
+        "Players are not stopped at the budget. Implies --bounded-memory.",
+    )
+    parser.add_argument(
+        "--run-id",
+        type=str,
+        help="Workers sharing a run ID and CACHE_DIR split the steam IDs between them.",
+    )
     parser.add_argument(
         "--display-player", action="store_true", help="Display player summaries."
     )
@@ -130,6 +198,65 @@ def get_args():
         help="Filter Giftable items",
     )
 
+    subparsers = parser.add_subparsers(dest="command")
+    query_parser = subparsers.add_parser(
+        "query", help="Find which players own an item, using the inventory index."
+    )
+    query_group = query_parser.add_mutually_exclusive_group(required=True)
+    query_group.add_argument(
+        "--market-hash-name", type=str, help="Players owning this market_hash_name."
+    )
+    query_group.add_argument("--hero", type=str, help="Players owning hero items.")
+    query_group.add_argument("--type", type=str, help="Players owning ItemType items.")
+    query_parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Rebuild the index from the cached inventories of --steam-ids first.",
+    )
+
+    changelog_parser = subparsers.add_parser(
+        "changelog", help="Show the item changes of --steam-ids between two dates."
+    )
+    changelog_parser.add_argument(
+        "--since",
+        type=datetime.fromisoformat,
+        help="Start date (ISO format), default: first snapshot.",
+    )
+    changelog_parser.add_argument(
+        "--until",
+        type=datetime.fromisoformat,
+        help="End date (ISO format), default: last snapshot.",
+    )
+
+    report_parser = subparsers.add_parser(
+        "report", help="Aggregate the cached inventories of --steam-ids."
+    )
+    report_parser.add_argument(
+        "--group-by",
+        choices=["player", "hero", "type", "market_hash_name"],
+        default="type",
+        help="Column to group the items by. default=type",
+    )
+    report_parser.add_argument(
+        "--workers", type=int, help="Processes loading the inventories."
+    )
+
+    for subparser in (query_parser, changelog_parser, report_parser):
+        subparser.add_argument(
+            "--steam-ids",
+            nargs="+",
+            type=steam_id,
+            default=argparse.SUPPRESS,
+            help="17-digit SteamIDs.",
+        )
+        subparser.add_argument(
+            "--app-contexts",
+            nargs="+",
+            type=app_context,
+            default=argparse.SUPPRESS,
+            help="app_id[:context_id] pairs, default: --app-id.",
+        )
+
     args = parser.parse_args()
     check_args(args)
     return args
@@ -4,9 +4,12 @@
 import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from steam_inventory_manager import constants
 from steam_inventory_manager import filesystem_handler
+from steam_inventory_manager import inventory_history
+from steam_inventory_manager import inventory_index
 from steam_inventory_manager import steam_api_handler
 from steam_inventory_manager import item
 
@@ -26,21 +29,30 @@ class Player:
         overwrite: bool = False,
         app_id: str = constants.APP_NAME,
         steam_user: str = None,
+        app_contexts: list = None,
+        bounded_memory: bool = False,
     ):
         """
         Initialize the player data.
+        app_contexts: list of (app_id, context_id) pairs fetched concurrently,
+        defaults to [(app_id, constants.CONTEXT_ID)].
+        bounded_memory: build slim items from the streamed cache files, the raw
+        inventory JSON is never held.
         """
 
         self.app_id = app_id
+        self.app_contexts = app_contexts or [(app_id, constants.CONTEXT_ID)]
         self.steam_id = (
             steam_id
             if steam_id is not None and steam_user is None
             else steam_api_handler.resolve_vanity(api_key, steam_user)
         )
         self.steam_user = ""
-        self.player_json_path = self.get_player_summaries_path(self.steam_id)
-        self.inventory_json_path = self.get_inventory_json_path(
-            self.steam_id, self.app_id
+        self.player_json_path = filesystem_handler.get_player_summaries_path(
+            self.steam_id
+        )
+        self.inventory_json_path = filesystem_handler.get_inventory_json_path(
+            self.steam_id, *self.app_contexts[0]
         )
         self.persona_name = ""
         self.profile_url = ""
@@ -70,10 +82,21 @@ class Player:
         self.load_info()
         # Load inventory
         self.inventory = []
-        self.inventory_json = self.fetch_inventory(api_key, overwrite)
-        self.inventory_json_assets = self.inventory_json.get("assets")
-        self.inventory_json_descriptions = self.inventory_json.get("descriptions")
-        self.load_inventory()
+        # (app_id, context_id) pairs whose inventory could not be fetched
+        self.incomplete_app_contexts = []
+        if bounded_memory:
+            # update_inventory_json_descriptions is not available in this mode
+            self.inventory_jsons = None
+            self.inventory_json = None
+            self.inventory_json_assets = None
+            self.inventory_json_descriptions = None
+            self.load_inventory_streaming(api_key, overwrite)
+        else:
+            self.inventory_jsons = self.fetch_inventories(api_key, overwrite)
+            self.inventory_json = self.merge_inventories(self.inventory_jsons)
+            self.inventory_json_assets = self.inventory_json.get("assets")
+            self.inventory_json_descriptions = self.inventory_json.get("descriptions")
+            self.load_inventory()
 
     def print(self):
         """
@@ -107,38 +130,35 @@ class Player:
         print(f"Location state code: {self.loc_state_code}")
         print("_" * 142, "\n")
 
-    def get_player_summaries_path(self, steam_id: str):
-        """
-        Returns the file path for the player file.
-        """
-        player_file = f"{steam_id}_summaries.json"
-        player_path = f"{constants.CACHE_DIR}/{player_file}"
-        return player_path
-
-    def get_inventory_json_path(self, steam_id: str, app_id: str):
-        """
-        Returns the file path for the inventory file.
-        """
-        inventory_file_name = f"{steam_id}_full_inventory_{app_id}.json"
-        inventory_file_path = f"{constants.CACHE_DIR}/{inventory_file_name}"
-        return inventory_file_path
-
     def fetch_summaries(self, api_key, overwrite):
         """
         Either fetch player summaries from disk or online
         Returns the player summaries.
         """
-        if os.path.exists(self.player_json_path) and not overwrite:
-            player_summaries = filesystem_handler.read_json(self.player_json_path)
-            return player_summaries
-        else:
+        mtime = filesystem_handler.get_mtime(self.player_json_path)
+        with filesystem_handler.cache_lock(self.player_json_path) as lease:
+            if self.is_cached(self.player_json_path, overwrite, mtime):
+                player_summaries = filesystem_handler.read_json(self.player_json_path)
+                return player_summaries
             logger.info("Fetching player summaries online")
             player_summaries = steam_api_handler.fetch_player_summaries(
                 api_key, self.steam_id
             )[0]
-            filesystem_handler.write_json(self.player_json_path, player_summaries)
+            filesystem_handler.write_json(
+                self.player_json_path, player_summaries, lease=lease
+            )
             return player_summaries
 
+    @staticmethod
+    def is_cached(json_file_path: str, overwrite: bool, mtime: float) -> bool:
+        """
+        Returns if the cache file can be used: it exists and either overwrite is
+        off or another worker refreshed it while we waited for its lock.
+        """
+        if not os.path.exists(json_file_path):
+            return False
+        return not overwrite or filesystem_handler.get_mtime(json_file_path) != mtime
+
     def load_info(self):
         """
         Load info from summaries dict
@@ -169,21 +189,81 @@ class Player:
         self.loc_country_code = self.player_summaries.get("loccountrycode")
         self.loc_state_code = self.player_summaries.get("locstatecode")
 
-    def fetch_inventory(self, api_key, overwrite):
+    def fetch_inventory(
+        self, api_key, overwrite, app_id=None, context_id=constants.CONTEXT_ID
+    ):
         """
         Either fetch player inventory from disk or online
         """
-        if os.path.exists(self.inventory_json_path) and not overwrite:
-            inventory = filesystem_handler.read_json(self.inventory_json_path)
-            return inventory
-        else:
-            logger.info("Fetching player inventory online")
+        app_id = app_id or self.app_id
+        inventory_json_path = filesystem_handler.get_inventory_json_path(
+            self.steam_id, app_id, context_id
+        )
+        mtime = filesystem_handler.get_mtime(inventory_json_path)
+        with filesystem_handler.cache_lock(inventory_json_path) as lease:
+            if self.is_cached(inventory_json_path, overwrite, mtime):
+                inventory = filesystem_handler.read_json(inventory_json_path)
+                return inventory
+            logger.info("Fetching player inventory online: %s/%s", app_id, context_id)
             inventory = steam_api_handler.fetch_inventory(
-                self.steam_id, self.app_id, api_key, constants.CONTEXT_ID
+                self.steam_id, app_id, api_key, context_id
+            )
+            filesystem_handler.write_json(inventory_json_path, inventory, lease=lease)
+            inventory_index.update_player(self.steam_id, inventory, app_id, context_id)
+            inventory_history.record_snapshot(
+                self.steam_id, inventory, app_id, context_id
             )
-            filesystem_handler.write_json(self.inventory_json_path, inventory)
             return inventory
 
+    def try_fetch_inventory(self, api_key, overwrite, app_id, context_id):
+        """
+        Fetch the inventory of one (app_id, context_id) pair.
+        Returns None, and records the pair in incomplete_app_contexts, if a page
+        keeps failing; its checkpoint is kept for the next run.
+        """
+        try:
+            return self.fetch_inventory(api_key, overwrite, app_id, context_id)
+        except steam_api_handler.IncompleteInventoryError as error:
+            logger.error(
+                "Skipping inventory %s/%s of %s: %s",
+                app_id,
+                context_id,
+                self.steam_id,
+                error,
+            )
+            self.incomplete_app_contexts.append((app_id, context_id))
+            return None
+
+    def fetch_inventories(self, api_key, overwrite):
+        """
+        Fetch the inventory of every (app_id, context_id) pair concurrently.
+        Returns a dict {(app_id, context_id): inventory}, without the pairs
+        that could not be fetched.
+        """
+        with ThreadPoolExecutor(max_workers=len(self.app_contexts)) as executor:
+            inventories = executor.map(
+                lambda app_context: self.try_fetch_inventory(
+                    api_key, overwrite, *app_context
+                ),
+                self.app_contexts,
+            )
+            return {
+                app_context: inventory
+                for app_context, inventory in zip(self.app_contexts, inventories)
+                if inventory is not None
+            }
+
+    @staticmethod
+    def merge_inventories(inventory_jsons: dict):
+        """
+        Merge the inventories of several apps into one player view.
+        """
+        inventory = {"assets": [], "descriptions": []}
+        for inventory_json in inventory_jsons.values():
+            inventory["assets"].extend(inventory_json.get("assets") or [])
+            inventory["descriptions"].extend(inventory_json.get("descriptions") or [])
+        return inventory
+
     def load_inventory(self):
         """
         Load inventory from inventory dict
@@ -193,6 +273,29 @@ class Player:
             for item_description in self.inventory_json_descriptions
         ]
 
+    def load_inventory_streaming(self, api_key, overwrite):
+        """
+        Load inventory one description at a time from the cache files, keeping
+        only the item fields used for output. The apps are loaded one after the
+        other; an online fetch is written to the cache and dropped first.
+        """
+        for app_id, context_id in self.app_contexts:
+            inventory_json_path = filesystem_handler.get_inventory_json_path(
+                self.steam_id, app_id, context_id
+            )
+            if overwrite or not os.path.exists(inventory_json_path):
+                if (
+                    self.try_fetch_inventory(api_key, overwrite, app_id, context_id)
+                    is None
+                ):
+                    continue
+            self.inventory.extend(
+                item.Item(item_description).slim()
+                for item_description in filesystem_handler.iter_json_records(
+                    inventory_json_path, "descriptions"
+                )
+            )
+
     def print_inventory(self, args):
         """
         Print inventory items
@@ -1,9 +1,13 @@
 """This module contains functions for fetching inventory data from the Steam API."""
 
+import json
+import os
 import sys
 import logging
+import time
 import requests
 from steam_inventory_manager import constants
+from steam_inventory_manager import filesystem_handler
 from steam_inventory_manager import inventory_validator
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
@@ -49,40 +53,136 @@ def fetch_player_summaries(api_key, steam_ids):
     return None
 
 
+def get_inventory_checkpoint_path(steam_id: str, app_id: str, context_id: str) -> str:
+    """Returns the file path for the pagination checkpoint of an inventory."""
+    checkpoint_file = f"{steam_id}_inventory_{app_id}_{context_id}_checkpoint.jsonl"
+    return f"{constants.CACHE_DIR}/{checkpoint_file}"
+
+
+def load_inventory_checkpoint(checkpoint_path: str) -> list:
+    """
+    Returns the pages saved in the pagination checkpoint (JSON lines, the first
+    one holds the time the fetch started).
+    Returns None if there is no checkpoint or it is older than
+    INVENTORY_CHECKPOINT_MAX_AGE; an expired checkpoint is discarded, its pages
+    and last_assetid no longer match the inventory.
+    """
+    lines = list(filesystem_handler.iter_json_lines(checkpoint_path))
+    if (
+        lines
+        and time.time() - json.loads(lines[0])["time"]
+        <= constants.INVENTORY_CHECKPOINT_MAX_AGE
+    ):
+        return [json.loads(line) for line in lines[1:]]
+    if os.path.exists(checkpoint_path):
+        logger.info("Discarding expired checkpoint '%s'.", checkpoint_path)
+        os.remove(checkpoint_path)
+    return None
+
+
+class IncompleteInventoryError(Exception):
+    """
+    Raised when an inventory page still fails after every retry.
+    The pages fetched so far are kept in the checkpoint, the caller must not
+    use the inventory and moves on to the next inventory.
+    """
+
+
+def fetch_inventory_page(url: str, params: dict, page: int) -> dict:
+    """
+    Fetches one inventory page, retrying with backoff on request errors,
+    non-200 responses, responses that are not JSON and pages failing
+    inventory_validator.validate_format.
+    Returns None if every attempt failed.
+    """
+    delay = constants.INVENTORY_RETRY_DELAY
+    for attempt in range(1, constants.INVENTORY_PAGE_RETRIES + 1):
+        try:
+            response = requests.get(
+                url, params=params, timeout=constants.INVENTORY_URL_TIMEOUT
+            )
+            if response.status_code != 200:
+                error = f"Status code: {response.status_code}"
+            else:
+                data = response.json()
+                if inventory_validator.validate_format(data):
+                    return data
+                error = "Invalid inventory page"
+        except (requests.RequestException, ValueError) as exception:
+            error = exception
+        logger.warning(
+            "Failed to fetch inventory page %d (attempt %d/%d). %s",
+            page,
+            attempt,
+            constants.INVENTORY_PAGE_RETRIES,
+            error,
+        )
+        if attempt < constants.INVENTORY_PAGE_RETRIES:
+            time.sleep(delay)
+            delay *= 2
+    return None
+
+
 def fetch_inventory(steam_id: str, app_id: str, api_key: str, context_id: str) -> dict:
-    """Fetches inventory data from the given URL with pagination."""
+    """
+    Fetches inventory data from the given URL with pagination.
+    Each page is appended to a checkpoint file, so a failed fetch resumes from
+    the checkpoint on the next attempt, unless it expired.
+    Raises IncompleteInventoryError if a page keeps failing.
+    """
+
+    checkpoint_path = get_inventory_checkpoint_path(steam_id, app_id, context_id)
+    pages = load_inventory_checkpoint(checkpoint_path)
+    if pages is None:
+        filesystem_handler.append_json_line(checkpoint_path, {"time": int(time.time())})
+        pages = []
+    elif pages:
+        logger.info("Resuming inventory fetch from page %d.", len(pages) + 1)
 
     inventory = {"assets": [], "descriptions": []}
+    start_assetid = None
+    for checkpoint_page in pages:
+        inventory["assets"].extend(checkpoint_page["assets"])
+        inventory["descriptions"].extend(checkpoint_page["descriptions"])
+        start_assetid = checkpoint_page["last_assetid"]
+    page = len(pages)
 
     # Construct the base URL and parameters
     url = f"https://steamcommunity.com/inventory/{steam_id}/{app_id}/{context_id}"
     params = {"key": api_key} if api_key else {}
 
     while True:
+        if start_assetid:
+            params["start_assetid"] = start_assetid
+
         # Make the API request
-        response = requests.get(
-            url, params=params, timeout=constants.INVENTORY_URL_TIMEOUT
-        )
-        if response.status_code != 200:
-            raise SystemExit(
-                f"Failed to fetch online inventory. Status code: {response.status_code}"
+        data = fetch_inventory_page(url, params, page + 1)
+        if data is None:
+            raise IncompleteInventoryError(
+                f"Failed to fetch inventory page {page + 1} of {steam_id}, "
+                f"checkpoint saved in: '{checkpoint_path}'"
             )
 
-        # Parse the JSON response
-        data = response.json()
-
-        if not inventory_validator.validate_format(data):
-            raise SystemExit("Invalid online inventory.")
-
         # Append the items to the result
+        page += 1
         inventory["assets"].extend(data["assets"])
         inventory["descriptions"].extend(data["descriptions"])
 
         # Check if there are more items to fetch
-        if data.get("more_items", 0) == 1:
-            params["start_assetid"] = data["last_assetid"]
-        else:
+        if data.get("more_items", 0) != 1:
             break
+        start_assetid = data["last_assetid"]
+        filesystem_handler.append_json_line(
+            checkpoint_path,
+            {
+                "last_assetid": start_assetid,
+                "assets": data["assets"],
+                "descriptions": data["descriptions"],
+            },
+        )
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
 
     return inventory
 
@@ -0,0 +1,61 @@
+"""This module shards the steam IDs across workers sharing the same CACHE_DIR."""
+
+import logging
+import os
+import sys
+from contextlib import contextmanager
+from steam_inventory_manager import constants
+from steam_inventory_manager import filesystem_handler
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__package__)
+
+
+def get_run_dir(run_id: str) -> str:
+    """
+    Returns the directory holding the claims of the given run.
+    """
+    return f"{constants.CACHE_DIR}/runs/{run_id}"
+
+
+def get_done_path(steam_id: str, run_id: str) -> str:
+    """
+    Returns the file path of the marker of a steam ID done in the given run.
+    """
+    return f"{get_run_dir(run_id)}/{steam_id}.done"
+
+
+@contextmanager
+def claim(steam_id: str, run_id: str):
+    """
+    Claim a steam ID of the run for this worker, while the context is open.
+    Workers started with the same run_id, on any host sharing CACHE_DIR, each
+    get a disjoint part of the steam IDs. A claim is a cache_lock lease,
+    released when the context exits, even on errors; call mark_done before
+    exiting so the ID is not claimed again.
+    Yields the lease, None if the ID is done or claimed by another worker.
+    """
+    run_dir = get_run_dir(run_id)
+    os.makedirs(run_dir, exist_ok=True)
+    if os.path.exists(get_done_path(steam_id, run_id)):
+        logger.info("'%s' already done in run '%s', skipping.", steam_id, run_id)
+        yield None
+        return
+    with filesystem_handler.cache_lock(
+        f"{run_dir}/{steam_id}", blocking=False
+    ) as lease:
+        if lease is None:
+            logger.info("'%s' claimed by another worker, skipping.", steam_id)
+        # Done by another worker between the check and the claim
+        elif os.path.exists(get_done_path(steam_id, run_id)):
+            lease = None
+        yield lease
+
+
+def mark_done(steam_id: str, run_id: str, lease: filesystem_handler.CacheLease):
+    """
+    Mark a claimed steam ID done in the given run, if the claim is still held.
+    """
+    lease.check()
+    with open(get_done_path(steam_id, run_id), "w", encoding="utf-8"):
+        pass